@@ -1,58 +1,74 @@
 import tkinter
-import numpy as np
 import math
+
+
+def square_mask(col, row):
+    """
+    bitboard mask for a square, one bit per square of the 8x8 board
+    params: col, row of the square
+    return: integer with the square's bit set, 0 for squares off the board
+    """
+    if 0 <= col < 8 and 0 <= row < 8:
+        return 1 << (row * 8 + col)
+    return 0
+
+
+def mask_square(mask):
+    """
+    inverse of square_mask for a single square
+    params: bitboard mask with one square's bit set
+    return: col, row of the square
+    """
+    sq = mask.bit_length() - 1
+    return sq % 8, sq // 8
+
+
 class Player:
     """
     Player class to be used in the Game obj
     Attributes:
     name: text to distinguish name of player ie player1, player2, computer
     color: hex code to color each player square on click event
-    white_pieces_dict: set data structure to keep track of player pieces
-    black_pieces_dict: set data structure to keep track of player pieces
+    white: bitboard (64-bit integer, one bit per square) to keep track of white pieces
+    black: bitboard (64-bit integer, one bit per square) to keep track of black pieces
     """
     def __init__(self, name, color):
         self.name = name
         self.color = color
         self.positions = set()
-        # dictionary of white pieces (to be updated regularly)    
-        self.white_pieces_dict = \
-        {'10':2,'30':4,'50':6,'70':8,\
-         '01':10,'21':12,'41':14,'61':16,\
-         '12':18,'32':20,'52':22,'72':24}
-        # dictionary of black pieces (to be updated regularly)
-        self.black_pieces_dict = \
-        {'07':2,'27':4,'47':6,'67':8,\
-         '16':10,'36':12,'56':14,'76':16,\
-         '05':18,'25':20,'45':22,'65':24}
-        # dictionary of promoted pieces
+        # bitboard of white pieces (to be updated regularly), rows 0-2
+        self.white = 0x0000000000AA55AA
+        # bitboard of black pieces (to be updated regularly), rows 5-7
+        self.black = 0x55AA550000000000
+        # dictionary of promoted pieces, keyed by (col, row) tuples
         self.white_kings = {}
         self.black_kings = {}
         move_from = [0,0]
         move_to = [0,0]
         
-    def remove_piece_from_white_dict(self, key):
-        # delete piece from whites dictionary
-        del self.white_pieces_dict[key]
+    def remove_white_piece(self, square):
+        # clear square's bit on whites bitboard
+        self.white &= ~square
         
-    def add_piece_to_white_dict(self, key):
-        # add piece to whites dictionary
-        self.white_pieces_dict[key] = str(key)
+    def add_white_piece(self, square):
+        # set square's bit on whites bitboard
+        self.white |= square
         
-    def remove_piece_from_black_dict(self, key):
-        # delete piece from blacks dictionary
-        del self.black_pieces_dict[key]
+    def remove_black_piece(self, square):
+        # clear square's bit on blacks bitboard
+        self.black &= ~square
         
-    def add_piece_to_black_dict(self, key):
-        # add piece to blacks dictionary
-        self.black_pieces_dict[key] = str(key)
+    def add_black_piece(self, square):
+        # set square's bit on blacks bitboard
+        self.black |= square
     
     def add_to_kings_white(self, key):
         # add piece to white king dict
-        self.white_kings[key] = str(key)
+        self.white_kings[key] = key
     
     def add_to_kings_black(self, key):
         # add piece to white king dict
-        self.black_kings[key] = str(key)
+        self.black_kings[key] = key
         
     def remove_black_king(self, key):
         # delete piece from blacks king dict
@@ -91,12 +107,8 @@ class Board:
         # create checkerboard pattern on frame
         for row in range(8):
             for column in range(8):
-                if row % 2 == 0 and (row*8 + column) % 2 == 1:
-                    color_square = '#769656'
-                elif row % 2 == 1 and (row*8 + column) % 2 == 0:
-                    color_square = '#769656'
-                else:
-                    color_square = '#eeeed2'
+                # dark squares are those where row + column is odd
+                color_square = '#769656' if (row + column) & 1 else '#eeeed2'
                 self.canvas.create_rectangle(self.sq_size  * column,
                                         self.sq_size  * row,
                                         self.sq_size  * (column + 1),
@@ -146,10 +158,6 @@ class Board:
         # normalize coordinate by square size
         column_floor, row_floor = self.floor_of_row_col(column, row) 
 
-        # convert coordinates to string, use string to locate position in 8x8 grid
-        
-        rowcol_key_str = str(column_floor) + str(row_floor)
-
         corner_column = (column_floor * self.sq_size) + self.sq_size
         corner_row =  (row_floor  * self.sq_size) + self.sq_size
         
@@ -291,29 +299,29 @@ class GameApp(object):
         capturing = [0,0]
         capturing[0] = int(sum([move_from[0],move_to[0]])/2)
         capturing[1] = int(sum([move_from[1],move_to[1]])/2)
-        capture_key = str(capturing[0]) + str(capturing[1])
-        print("from legality fn : "+str(capture_key)+"\n")
+        capture_square = square_mask(capturing[0], capturing[1])
+        print("from legality fn : "+str(capturing)+"\n")
         # allow only single forward diagonal forward moves otherwise
         if player_turn == 0: # player 0 is black pieces
             # movement for standard pieces
             if is_king == False:
-                if np.abs(move_from[0]-move_to[0]) == 2 and \
-                move_from[1]-move_to[1] == 2 and capture_key in\
-                self.player2.white_pieces_dict.values():
-                    return capture_key #  move is allowed AND it's a capture
-                elif np.abs(move_from[0]-move_to[0]) == 1 and \
+                if abs(move_from[0]-move_to[0]) == 2 and \
+                move_from[1]-move_to[1] == 2 and \
+                self.player2.white & capture_square:
+                    return capture_square #  move is allowed AND it's a capture
+                elif abs(move_from[0]-move_to[0]) == 1 and \
                     move_from[1]-move_to[1] == 1 :
                     return True
                 else:
                     return False
             # movement for promoted pieces
             elif is_king == True:
-                if np.abs(move_from[0]-move_to[0]) == 2 and \
-                np.abs(move_from[1]-move_to[1]) == 2 and capture_key in\
-                self.player2.white_pieces_dict.values():
-                    return capture_key #  move is allowed AND it's a capture
-                elif np.abs(move_from[0]-move_to[0]) == 1 and \
-                    np.abs(move_from[1]-move_to[1]) == 1 :
+                if abs(move_from[0]-move_to[0]) == 2 and \
+                abs(move_from[1]-move_to[1]) == 2 and \
+                self.player2.white & capture_square:
+                    return capture_square #  move is allowed AND it's a capture
+                elif abs(move_from[0]-move_to[0]) == 1 and \
+                    abs(move_from[1]-move_to[1]) == 1 :
                     return True
                 else:
                     return False
@@ -321,11 +329,11 @@ class GameApp(object):
         if player_turn == 1: # player 1 is white pieces
             # movement for standard pieces
             if is_king == False:
-                if np.abs(move_from[0]-move_to[0]) == 2 and\
-                move_from[1]-move_to[1] == -2 and capture_key in\
-                self.player1.black_pieces_dict.values() :
-                    return capture_key #  move is allowed AND it's a capture
-                elif np.abs(move_from[0]-move_to[0]) == 1 and \
+                if abs(move_from[0]-move_to[0]) == 2 and\
+                move_from[1]-move_to[1] == -2 and \
+                self.player1.black & capture_square:
+                    return capture_square #  move is allowed AND it's a capture
+                elif abs(move_from[0]-move_to[0]) == 1 and \
                     move_from[1]-move_to[1] == -1 :
                     return True
                 else:
@@ -333,12 +341,12 @@ class GameApp(object):
 
             # movement for promoted pieces
             elif is_king == True:
-                if np.abs(move_from[0]-move_to[0]) == 2 and \
-                np.abs(move_from[1]-move_to[1]) == 2 and capture_key in\
-                self.player1.black_pieces_dict.values():
-                    return capture_key #  move is allowed AND it's a capture
-                elif np.abs(move_from[0]-move_to[0]) == 1 and \
-                    np.abs(move_from[1]-move_to[1]) == 1 :
+                if abs(move_from[0]-move_to[0]) == 2 and \
+                abs(move_from[1]-move_to[1]) == 2 and \
+                self.player1.black & capture_square:
+                    return capture_square #  move is allowed AND it's a capture
+                elif abs(move_from[0]-move_to[0]) == 1 and \
+                    abs(move_from[1]-move_to[1]) == 1 :
                     return True
                 else:
                     return False
@@ -350,15 +358,14 @@ class GameApp(object):
         every move like this
         """
         free = True
-        target_key = str(move_from[0]+1) + str(move_from[1]+1)
+        occupied = self.player1.black | self.player2.white
+        target_square = square_mask(move_from[0]+1, move_from[1]+1)
         if player_turn == 0:
-            if target_key not in self.player1.black_pieces_dict.values() and \
-                target_key not in self.player1.white_pieces_dict.values():
+            if not occupied & target_square:
                 return True
-        target_key = str(move_from[0]+1) + str(move_from[1]-1)
+        target_square = square_mask(move_from[0]+1, move_from[1]-1)
         if player_turn == 0:
-            if target_key in self.player1.black_pieces_dict.values() or \
-                target_key in self.player1.white_pieces_dict.values():
+            if occupied & target_square:
                 free = True
             
     def play(self, event):
@@ -381,7 +388,8 @@ class GameApp(object):
         target_col, target_row = self.board.find_coords_of_selected_sq(event)
         # coordinates for dictionary management
         col_fl, row_fl = self.board.floor_of_row_col(event.x, event.y)
-        rowcol_key = str(col_fl) + str(row_fl)
+        rowcol_key = (col_fl, row_fl)
+        square = square_mask(col_fl, row_fl)
         
         self.promote = False        
 
@@ -392,7 +400,7 @@ class GameApp(object):
             self.player1.move_from = [col_fl, row_fl]
             # prevent pieces being trapped
             #if self.isTrapped(self.player1.move_from, self.player_turn) == False:
-            if rowcol_key in self.player1.black_pieces_dict:
+            if self.player1.black & square:
                 self.board.delete_piece(event,
                                     target_col,
                                     target_row)
@@ -404,7 +412,7 @@ class GameApp(object):
                 else:
                     self.is_king = False
                 #remove piece from dictionary
-                self.player1.remove_piece_from_black_dict(rowcol_key)
+                self.player1.remove_black_piece(square)
                 print("removed "+str(rowcol_key))
                 self.phase = 1      
 
@@ -417,8 +425,7 @@ class GameApp(object):
             legality = self.isLegal(self.player1.move_from, self.player1.move_to, self.player_turn, self.is_king)
             print("legality: "+str(legality) )
             if legality == True:
-                if rowcol_key not in self.player1.black_pieces_dict and \
-                        rowcol_key not in self.player2.white_pieces_dict:
+                if not (self.player1.black | self.player2.white) & square:
                     # draw piece on canvas
                     print("promote? "+str(self.promote))
                     if self.promote == False:
@@ -439,9 +446,9 @@ class GameApp(object):
                                             self.player1.color)
                         print("placing king")
                     # add piece to dictionary 
-                    self.player1.black_pieces_dict[rowcol_key] = str(rowcol_key)
+                    self.player1.add_black_piece(square)
                     if self.promote == True or self.is_king == True:
-                        self.player1.black_kings[rowcol_key] = str(rowcol_key)
+                        self.player1.add_to_kings_black(rowcol_key)
                     self.phase = 0
                     # switch turn
                     self.player_turn = 1
@@ -453,8 +460,8 @@ class GameApp(object):
                             self.player1.move_from[0])*self.board_size, target_row+self.board_size)
                 
                 #remove piece from dictionary
-                self.player2.remove_piece_from_white_dict(legality)
-                print("removed "+str(legality))
+                self.player2.remove_white_piece(legality)
+                print("removed "+str(mask_square(legality)))
                 # draw piece on canvas
                 print("promote? "+str(self.promote))
                 if self.promote == False:
@@ -476,9 +483,9 @@ class GameApp(object):
                                         self.player1.color)
                     print("placing king")
                 # add piece to dictionary 
-                self.player1.black_pieces_dict[rowcol_key] = str(rowcol_key)
+                self.player1.add_black_piece(square)
                 if self.promote == True:
-                    self.player1.black_kings[rowcol_key] = str(rowcol_key)
+                    self.player1.add_to_kings_black(rowcol_key)
                 self.phase = 0
                 # switch turn
                 self.player_turn = 1
@@ -490,7 +497,7 @@ class GameApp(object):
             self.player2.move_from = [col_fl, row_fl]
             # prevent pieces being trapped
             #if self.isTrapped(self.player1.move_from, self.player_turn) == False:
-            if rowcol_key in self.player2.white_pieces_dict:
+            if self.player2.white & square:
                 self.board.delete_piece(event,
                                     target_col,
                                     target_row)
@@ -502,7 +509,7 @@ class GameApp(object):
                 else:
                     self.is_king = False
                 #remove piece from dictionary
-                self.player2.remove_piece_from_white_dict(rowcol_key)
+                self.player2.remove_white_piece(square)
                 print("removed "+str(rowcol_key))
                 self.phase = 1      
 
@@ -514,8 +521,7 @@ class GameApp(object):
             
             legality = self.isLegal(self.player2.move_from, self.player2.move_to, self.player_turn, self.is_king)
             if legality == True:
-                if rowcol_key not in self.player2.white_pieces_dict and \
-                        rowcol_key not in self.player1.black_pieces_dict:
+                if not (self.player2.white | self.player1.black) & square:
                     # draw piece on canvas
                     print("promote? "+str(self.promote))
                     if self.promote == False:
@@ -536,9 +542,9 @@ class GameApp(object):
                                             self.player2.color)
                         print("placing king")
                     # add piece to dictionary 
-                    self.player2.white_pieces_dict[rowcol_key] = str(rowcol_key)
+                    self.player2.add_white_piece(square)
                     if self.promote == True or self.is_king == True:
-                        self.player2.white_kings[rowcol_key] = str(rowcol_key)
+                        self.player2.add_to_kings_white(rowcol_key)
                     self.phase = 0
                     # switch turn
                     self.player_turn = 0
@@ -549,9 +555,9 @@ class GameApp(object):
                 self.board.capture_piece(target_col-math.copysign(1, self.player2.move_to[0]-\
                             self.player2.move_from[0])*self.board_size, target_row-self.board_size)
                 
-                print("removed "+str(legality))
+                print("removed "+str(mask_square(legality)))
                 #remove piece from dictionary
-                self.player1.remove_piece_from_black_dict(legality)
+                self.player1.remove_black_piece(legality)
             
                 # draw piece on canvas
                 print("promote? "+str(self.promote))
@@ -574,9 +580,9 @@ class GameApp(object):
                                         self.player2.color)
                     print("placing king")
                 # add piece to dictionary 
-                self.player2.white_pieces_dict[rowcol_key] = str(rowcol_key)
+                self.player2.add_white_piece(square)
                 if self.promote == True:
-                    self.player2.white_kings[rowcol_key] = str(rowcol_key)
+                    self.player2.add_to_kings_white(rowcol_key)
                 self.phase = 0
                 # switch turn
                 self.player_turn = 0
@@ -3,131 +3,170 @@ Credit card fraud detection
  ~ Shane Short
 """
 
-import random
 import datetime
 import hashlib
 import time
 # non standard libraries
 import numpy as np
 
+# random number generator shared by the data generation functions
+rng = np.random.default_rng()
 
-def luhn_check_dig(num):
+
+def luhn_check_digs(payloads):
     """
-    Function to compute the Luhn Algorithms check sum digit for a given card number
-    Parameters:
-                num (int): A randomly generated 15-digit number
+    Function to compute the Luhn Algorithms check sum digits for a batch of card numbers at once
+        Parameters:
+                payloads (numpy array): Randomly generated 15-digit numbers (int64)
         Returns:
-                check_sim (int): The associated check sum digit for the given random number
+                check_sums (numpy array): The associated check sum digit for each random number
     """
-    str1 = (str(num)[::-1])[0::2]
-    str2 = (str(num)[::-1])[1::2]
-    doubles = [2 * int(x) for x in str2]
-    res = sum([sum([int(a) for a in str(x)]) for x in doubles]) + sum([int(x) for x in str1])
-    check_sum = 10 - (res % 10)
-    return check_sum
+    # split every payload into a (N, 15) matrix of digits, most significant digit first
+    positions = np.arange(14, -1, -1)
+    digits = (payloads[:, None] // 10**positions) % 10
+
+    # double the rightmost digit and every second digit before it and add the digits of the product,
+    # once the check digit is appended these are the digits Luhn validation doubles
+    doubled = digits * np.tile([2, 1], 8)[:15]
+    doubled -= (doubled > 9) * 9
 
+    check_sums = (10 - doubled.sum(axis=1) % 10) % 10
+    return check_sums
 
-def gen_card_no():
+
+def gen_card_no(num_cards):
     """
-    Function to generate a random valid card number
+    Function to generate a batch of random valid card numbers
         Parameters:
+                num_cards (int): The number of card numbers to generate
         Returns:
-                cardno (int): A valid card number
+                cardnos (list): A list of valid card numbers (int)
     """
-    payload = int(''.join(["{}".format(random.randint(0, 9)) for num in range(0, 15)]))
-    check_dig = luhn_check_dig(payload)
-    cardno = int(str(payload) + str(check_dig))
-    return cardno
+    # draw the random 15-digit payload of every card in a single call
+    payloads = rng.integers(0, 10**15, size=num_cards)
+    cardnos = (payloads * 10 + luhn_check_digs(payloads)).tolist()
+    return cardnos
 
 
-def random_date(start, end):
+def random_date(start, end, size):
     """
-    Function to generate a random date between two given values
+    Function to generate a batch of random dates between two given values
         Parameters:
                 start (datetime object): start of the given range
                 end (datetime object): end of the given range
+                size (int): The number of dates to generate
         Returns:
-                start + timedelta(seconds=random_second) (datetime object): A random time within a range
+                start + random_seconds (numpy array): Random times (datetime64[s]) within a range
     """
     delta = end - start
     int_delta = (delta.days * 24 * 60 * 60) + delta.seconds
-    random_second = random.randrange(int_delta)
-    return start + datetime.timedelta(seconds=random_second)
+    random_seconds = rng.integers(0, int_delta, size=size)
+    return np.datetime64(start, 's') + random_seconds.astype('timedelta64[s]')
 
 
-def generate_trans(card_number, range):
+def generate_trans(card_number, range, num_trans):
     """
-    Function to generate a semi-realistic distribution of transactions
+    Function to generate a semi-realistic distribution of transactions for a single card
         Parameters:
                 card_number (int): A valid card number in plain text format
                 range (tuple): The space in time over which transaction take place
+                num_trans (int): The number of transactions to generate
         Returns:
                 hashed_card.hexdigest() (str): hexadecimal encoding of the md5 hashed card number
-                timestamp (datetime object): Time the transaction occurred
-                amt (float): Amount spent
+                timestamps (numpy array): Times the transactions occurred (datetime64[s])
+                amts (numpy array): Amounts spent (float64)
     """
-    # generate a timestamp
-    timestamp = random_date(range[0], range[1]).strftime('%Y-%m-%dT%H:%M:%S')
+    # generate all of the timestamps in one call
+    timestamps = random_date(range[0], range[1], num_trans)
 
-    # generate a transaction amount
+    # generate the transaction amounts
     # lets assume small transactions are more common than large ones
     # and that this difference is approximately gaussian
-    # mean and standard deviation to generate the distribution of transaction amounts
-    mu, sigma = 0, 100.0
-    amt = np.abs(np.random.normal(mu, sigma, 1))[0]
+    # standard deviation of the (zero mean) distribution of transaction amounts,
+    # the absolute value of a standard normal draw is scaled by it in place
+    sigma = 100.0
+    amts = np.abs(rng.standard_normal(num_trans))
+    amts *= sigma
 
     # Let's use md5 to handle the string hashing
     hashed_card = hashlib.md5(str(card_number).encode())
 
-    return hashed_card.hexdigest(), timestamp, amt
+    return hashed_card.hexdigest(), timestamps, amts
 
 
-def flag_fraudulent_activity(transactions, range, threshold):
+def flag_fraudulent_activity(transactions, range, threshold, debug=False):
     """
     Function to flag potentially fraudulent transaction activity
         Parameters:
-                transactions (dict): A dictionary of transaction data
-                    key:
-                        - hashed card number
-                    values:
-                        - transaction timestamp
-                        - transaction amount
+                transactions (tuple): Transaction data for every card stored in flat numpy arrays
+                    - list of hashed card numbers
+                    - numpy array of transaction timestamps (datetime64[s])
+                    - numpy array of transaction amounts (float64)
+                    - numpy array of offsets (int64), card k owns the slice offsets[k]:offsets[k + 1]
                 range (tuple): The space in time over which transaction take place
                 threshold (int): The daily spending threshold above which activity is flagged as fraudulent
+                debug (bool): Print the details of each flagged card
 
         Returns:
                 flagged_cards (list): A list of the card hashes which have been identified as fraudulent
     """
     fraudulent_cards = []
-    # set the initial starting point of the sliding window
-    window_centre = range[0]
-
-    while window_centre < range[1]:
-
-        # create sliding time window values
-        window_centre += datetime.timedelta(seconds=3600 * 6)
-        window_start = window_centre + datetime.timedelta(seconds=-3600 * 12)
-        window_end = window_centre + datetime.timedelta(seconds=3600 * 12)
-        # print(f"24-hour window from {window_start} to {window_end}")
-
-        # determine if each transaction dict entry falls within this window
-        for key, value in transactions.items():
-            # set var for spend per day
-            amt_per_day = 0
-            for transaction in value:
-                time = datetime.datetime.strptime(transaction[0], '%Y-%m-%dT%H:%M:%S')
-                if window_start <= time <= window_end:
-                    amt_per_day += transaction[1]
-            if amt_per_day > threshold:
-                print("Potential fraudulent activity flagged.")
-                print(f"Card hash {key} \n in 24 hours around {window_centre}")
-                print(f"total spend on this day by card {key}: {amt_per_day} \n")
-                fraudulent_cards.append(key)
-
-    # drop duplicate card hashes by casting to a set and back to a list
-    unique_hashes = (list(set(fraudulent_cards)))
-
-    return unique_hashes
+    # the sliding window is shifted in 6 hour steps and spans 24 hours (4 steps)
+    bin_width = 3600 * 6
+    bins_per_window = 4
+
+    card_hashes, times, amts, offsets = transactions
+    n_cards = len(card_hashes)
+
+    # seconds since the start of the first window, 6 hours before the start of the range, for every transaction
+    start = np.datetime64(range[0], 's') - np.timedelta64(bin_width, 's')
+    seconds = (times - start).astype(np.int64)
+
+    # the window centre steps forward from the start of the range until it reaches the end of the range,
+    # and the windows share their 6 hour bins, the last window ending 4 bins after the last centre
+    span = int((np.datetime64(range[1], 's') - np.datetime64(range[0], 's')).astype(np.int64))
+    n_windows = -(-span // bin_width)
+    if n_windows <= 0:
+        return fraudulent_cards
+    n_bins = n_windows + bins_per_window - 1
+
+    # card index of every transaction, card k owns the slice offsets[k]:offsets[k + 1]
+    card_idx = np.repeat(np.arange(n_cards), np.diff(offsets))
+
+    # transactions before the first window or after the last are never scanned, drop them rather than
+    # let a bin outside 0..n_bins - 1 wrap around into another card's row
+    scanned = (seconds >= 0) & (seconds <= n_bins * bin_width)
+    card_idx, seconds, amts = card_idx[scanned], seconds[scanned], amts[scanned]
+
+    # bucket the spend of every card into 6 hour bins in a single pass, one row per card,
+    # a transaction exactly at the end of the last window only counts through its end point below
+    binned = seconds < n_bins * bin_width
+    bin_sums = np.bincount(card_idx[binned] * n_bins + seconds[binned] // bin_width, weights=amts[binned],
+                           minlength=n_cards * n_bins).reshape(n_cards, n_bins)
+
+    # rolling sum over 4 consecutive bins gives the total for every card and 24 hour window at once
+    rolling = np.lib.stride_tricks.sliding_window_view(bin_sums, bins_per_window, axis=1).sum(axis=2)
+
+    # the bins are half open but a window includes its end point, so a transaction exactly on a bin
+    # boundary also counts towards the window ending there, which starts 4 bins earlier
+    on_end = (seconds % bin_width == 0) & (seconds >= bin_width * bins_per_window)
+    np.add.at(rolling, (card_idx[on_end], seconds[on_end] // bin_width - bins_per_window), amts[on_end])
+
+    # a single test per card, so each card is flagged at most once
+    windows = rolling.argmax(axis=1)
+    amts_per_day = rolling[np.arange(n_cards), windows]
+
+    for k in np.flatnonzero(amts_per_day > threshold):
+        key = card_hashes[k]
+        if debug:
+            window_centre = start.astype(datetime.datetime) + \
+                datetime.timedelta(seconds=int(windows[k] + bins_per_window // 2) * bin_width)
+            print("Potential fraudulent activity flagged.")
+            print(f"Card hash {key} \n in 24 hours around {window_centre}")
+            print(f"total spend on this day by card {key}: {amts_per_day[k]} \n")
+        fraudulent_cards.append(key)
+
+    return fraudulent_cards
 
 
 if __name__ == '__main__':
@@ -138,29 +177,28 @@ if __name__ == '__main__':
     d1 = datetime.datetime.strptime('1/1/2021 12:00 AM', '%m/%d/%Y %I:%M %p')
     d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
-    # create a dictionary to store our sample data in
-    trans = dict()
-
     num_cards = int(input("How many cards are we generating? "))
-    for card in range(num_cards):
-        # create the card no. using a Luhn algorithm check sum digit appended to a random 15-digit number
-        card_num = gen_card_no()
-
-        # loop over each card number to generate a good volume of data
-        for i in range(random.randint(200, 2000)):
-            # return a transaction
-            hashed_card_no, timestamp, amt = generate_trans(card_num, (d1, d2))
-            # some logic for writing multiple values to the `card_num` key
-            if hashed_card_no in trans:
-                # append the new tuple to the existing array at this slot
-                trans[hashed_card_no].append((timestamp, amt))
-            else:
-                # create a new array in this slot
-                trans[hashed_card_no] = [(timestamp, amt)]
-
-        # print(f"Sample card transactions for a single customer \n {trans[hashed_card_no]}")
-
-    print(f"generated sample data for card hashes: ({trans.keys()})")
+    # create the card nos. using a Luhn algorithm check sum digit appended to a random 15-digit number
+    card_nums = gen_card_no(num_cards)
+    # draw the number of transactions for every card up front to generate a good volume of data
+    num_trans = rng.integers(200, 2001, size=num_cards)
+
+    # preallocate flat arrays to store our sample data in, card k owns the slice offsets[k]:offsets[k + 1]
+    offsets = np.concatenate(([0], num_trans.cumsum()))
+    all_times = np.empty(offsets[-1], dtype='datetime64[s]')
+    all_amts = np.empty(offsets[-1], dtype=np.float64)
+    card_hashes = []
+
+    for k, card_num in enumerate(card_nums):
+        # return every transaction for this card as numpy arrays of timestamps and amounts
+        hashed_card_no, timestamps, amts = generate_trans(card_num, (d1, d2), num_trans[k])
+        card_hashes.append(hashed_card_no)
+        all_times[offsets[k]:offsets[k + 1]] = timestamps
+        all_amts[offsets[k]:offsets[k + 1]] = amts
+
+    trans = (card_hashes, all_times, all_amts, offsets)
+
+    print(f"generated sample data for card hashes: ({card_hashes})")
 
     threshold = int(input("Enter a price threshold: "))
 
@@ -10,6 +10,9 @@ import time
 # non standard libraries
 import numpy as np
 
+# random number generator shared by the data generation functions
+rng = np.random.default_rng()
+
 
 def luhn_check_dig(num):
     """
@@ -40,100 +43,116 @@ def gen_card_no():
     return cardno
 
 
-def random_date(start, end):
+def random_date(start, end, int_delta):
     """
-    Function to generate a random date between two given values
+    Function to generate random dates in chronological order between two given values
         Parameters:
                 start (datetime object): start of the given range
                 end (datetime object): end of the given range
+                int_delta (int): The largest gap (in seconds) between consecutive dates
         Returns:
-                start + timedelta(seconds=random_second) (datetime object): A random time within a range
+                start + offsets (numpy array): Random times (datetime64[s]), the last one on or after end
     """
+    # range in seconds
     delta = end - start
-    int_delta = (delta.days * 24 * 60 * 60) + delta.seconds
-    random_second = random.randrange(int_delta)
-    return start + datetime.timedelta(seconds=random_second)
+    span = (delta.days * 24 * 60 * 60) + delta.seconds
+
+    # draw the random gaps between consecutive dates in batches until they cover the range
+    offsets = np.zeros(1, dtype=np.int64)
+    while offsets[-1] < span:
+        gaps = rng.integers(0, int_delta, size=2 * span // int_delta + 1)
+        offsets = np.concatenate((offsets, offsets[-1] + gaps.cumsum()))
 
+    # keep every date up to and including the first one on or after the end of the range
+    offsets = offsets[1:np.searchsorted(offsets, span) + 1]
+    return np.datetime64(start, 's') + offsets.astype('timedelta64[s]')
 
-def generate_trans(card_number, timestamp):
+
+def generate_trans(hashed_card, timestamps):
     """
-    Function to generate a semi-realistic distribution of transactions
+    Function to generate a semi-realistic distribution of transactions for a single card
         Parameters:
-                card_number (int): A valid card number in plain text format
-                range (tuple): The space in time over which transaction take place
+                hashed_card (str): hexadecimal encoding of the md5 hashed card number
+                timestamps (numpy array): Times the transactions occurred (datetime64[s])
         Returns:
-                hashed_card.hexdigest() (str): hexadecimal encoding of the md5 hashed card number
-                timestamp (datetime object): Time the transaction occurred
-                amt (float): Amount spent
+                transactions (list): A list of transaction data in tuple format
+                    - (<card hash>, <timestamp in seconds since the epoch>, <amount>)
     """
-    # generate a transaction amount
+    # generate the transaction amounts for every timestamp in a single draw
     # lets assume small transactions are more common than large ones
     # and that this difference is approximately gaussian
-    # mean and standard deviation to generate the distribution of transaction amounts
-    mu, sigma = 0, 100.0
-    amt = np.abs(np.random.normal(mu, sigma, 1))[0]
+    # standard deviation of the (zero mean) distribution of transaction amounts,
+    # the absolute value of a standard normal draw is scaled by it in place
+    sigma = 100.0
+    amts = np.abs(rng.standard_normal(len(timestamps)))
+    amts *= sigma
 
-    # Let's use md5 to handle the string hashing
-    hashed_card = hashlib.md5(str(card_number).encode())
+    return list(zip([hashed_card] * len(timestamps), timestamps.astype(np.int64).tolist(), amts.tolist()))
 
-    return hashed_card.hexdigest(), timestamp, amt
 
-
-def flag_fraudulent_activity(transactions, range, threshold, granularity):
+def flag_fraudulent_activity(transactions, range, threshold, granularity, debug=False):
     """
     Function to flag potentially fraudulent transaction activity
         Parameters:
-                transactions (list): A list of transaction data in comma separated string format
-                    - '<card hash>,<timestamp>,<amount>'
+                transactions (list): A list of transaction data in tuple format
+                    - (<card hash>, <timestamp in seconds since the epoch>, <amount>)
                 range (tuple): The space in time over which transaction take place
                 threshold (int): The daily spending threshold above which activity is flagged as fraudulent
+                granularity (int): The increment (in seconds) by which each timeseries window is shifted
+                debug (bool): Print the details of every flagged window once the scan is finished
 
         Returns:
                 flagged_cards (list): A list of the card hashes which have been identified as fraudulent
     """
     fraudulent_cards = []
-    # set the initial starting point of the sliding window
-    window_centre = range[0]
-
-    # convert trans into an indexible array
-    transactions = [el.split(',') for el in transactions]
+    # (card hash, window centre, total spend) for every flagged window, reported after the scan
+    flagged_windows = []
+    # centres of the sliding windows in seconds since the epoch, shifted by granularity until
+    # the first centre on or after the end of the range
+    range_start = int(np.datetime64(range[0], 's').astype(np.int64))
+    range_end = int(np.datetime64(range[1], 's').astype(np.int64))
+    window_centres = np.arange(range_start + granularity, range_end + granularity, granularity)
+
+    # group the timestamps and amounts of each card once
+    card_trans = dict()
+    for card_num, stamp, amt in transactions:
+        card_stamps, card_amts = card_trans.setdefault(card_num, ([], []))
+        card_stamps.append(stamp)
+        card_amts.append(amt)
 
     # get unique card hashes
-    unique_hashes = list(set([x[0] for x in transactions]))
+    unique_hashes = list(card_trans.keys())
     print(f"unique cards in dataset: {unique_hashes}")
 
-    while window_centre < range[1]:
-
-        # create sliding time window values
-        window_centre += datetime.timedelta(seconds=granularity)
-        window_start = window_centre + datetime.timedelta(seconds=-3600 * 12)
-        window_end = window_centre + datetime.timedelta(seconds=3600 * 12)
-        # print(f"24-hour window from {window_start} to {window_end}")
-
-        # create a zero entry in a list for each card present
-        amt_per_day = [0]*len(unique_hashes)
+    for card_num, (stamps, amts) in card_trans.items():
+        # sort the card's transactions by time and build a running total of spend
+        stamps = np.array(stamps, dtype=np.int64)
+        order = np.argsort(stamps)
+        stamps = stamps[order]
+        cumsum = np.concatenate(([0.], np.array(amts)[order].cumsum()))
 
-        # determine if each transaction dict entry falls within this window
-        for i in transactions:
-            # time of current transaction
-            time = datetime.datetime.strptime(i[1], '%Y-%m-%dT%H:%M:%S')
-            # check time is within the target window
-            if window_start <= time <= window_end:
-                # add transaction amount to that cards amount total per window
-                amt_per_day[unique_hashes.index(i[0])] += float(i[2])
+        # the spend inside every window is the difference of two cumulative sums
+        lo = np.searchsorted(stamps, window_centres - 3600 * 12)
+        hi = np.searchsorted(stamps, window_centres + 3600 * 12, side='right')
+        amt_per_day = cumsum[hi] - cumsum[lo]
 
         # check is daily total greater than the threshold amount
-        for card_num in unique_hashes:
-            if amt_per_day[unique_hashes.index(card_num)] > threshold:
-                print("Potential fraudulent activity flagged.")
-                print(f"Card hash {card_num} \n in 24 hours around {window_centre}")
-                print(f"total spend on this day by card {card_num}: {amt_per_day[unique_hashes.index(card_num)]} \n")
-                fraudulent_cards.append(card_num)
+        if amt_per_day.max(initial=0) > threshold:
+            fraudulent_cards.append(card_num)
+            if debug:
+                # format the centres of the card's flagged windows in one vectorized call
+                flagged = np.flatnonzero(amt_per_day > threshold)
+                centres = np.datetime_as_string(window_centres[flagged].astype('datetime64[s]'))
+                flagged_windows.extend(zip([card_num] * len(flagged), centres, amt_per_day[flagged]))
 
-    # drop duplicate card hashes by casting to a set and back to a list
-    unique_hashes = (list(set(fraudulent_cards)))
+    # write the report in a single call rather than from inside the window loop
+    if debug:
+        print("".join(f"Potential fraudulent activity flagged.\n"
+                      f"Card hash {card_num} \n in 24 hours around {centre}\n"
+                      f"total spend on this day by card {card_num}: {total} \n\n"
+                      for card_num, centre, total in flagged_windows), end="")
 
-    return unique_hashes
+    return fraudulent_cards
 
 
 if __name__ == '__main__':
@@ -144,26 +163,26 @@ if __name__ == '__main__':
     d1 = datetime.datetime.strptime('1/1/2021 12:00 AM', '%m/%d/%Y %I:%M %p')
     d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
-    # create a list to store our sample data in
+    # create a list to store our sample data in, and a set of the card hashes it covers
     trans = []
+    card_hashes_seen = set()
 
     num_cards = int(input("How many cards are we generating? "))
     for card in range(num_cards):
         # create the card no. using a Luhn algorithm check sum digit appended to a random 15-digit number
         card_num = gen_card_no()
+        # Let's use md5 to handle the string hashing, once per card rather than per transaction
+        hashed_card = hashlib.md5(str(card_num).encode()).hexdigest()
+        card_hashes_seen.add(hashed_card)
 
         # generate transaction data in chronological order
-        stamp = d1
-        while stamp < d2:
-            stamp = random_date(stamp, stamp + datetime.timedelta(seconds=3600 * 24))
-            str_stamp = stamp.strftime('%Y-%m-%dT%H:%M:%S')
-            # return a transaction
-            hashed_card_no, str_stamp, amt = generate_trans(card_num, str_stamp)
-            trans.append(f"{hashed_card_no},{str_stamp},{amt}")
+        # consecutive transactions are at most a day apart
+        # timestamps are kept as seconds since the epoch and only formatted for printing
+        trans.extend(generate_trans(hashed_card, random_date(d1, d2, 3600 * 24)))
 
     print(f"{len(trans)} transactions generated")
 
-    elmnts = list(set([x[0] for x in [el.split(',') for el in trans]]))
+    elmnts = list(card_hashes_seen)
     print(f"generated sample data for card hashes: ({elmnts})")
 
     threshold = int(input("Enter a price threshold: "))
@@ -11,6 +11,12 @@ import unittest
 # non standard libraries
 import numpy as np
 
+# random number generator shared by the data generation functions
+rng = np.random.default_rng()
+
+# digit sum of twice each digit, i.e. the value a doubled digit contributes to the Luhn sum
+LUHN_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
 
 def luhn_check_dig(num):
     """
@@ -18,11 +24,15 @@ def luhn_check_dig(num):
         :param num (int): A randomly generated 15-digit number
         :return check_sim (int): The associated check sum digit for the given random number
     """
-    str1 = (str(num)[::-1])[0::2]
-    str2 = (str(num)[::-1])[1::2]
-    doubles = [2 * int(x) for x in str2]
-    res = sum([sum([int(a) for a in str(x)]) for x in doubles]) + sum([int(x) for x in str1])
-    check_sum = 10 - (res % 10)
+    # walk the digits from the right, doubling the rightmost digit of the payload and every second one after it
+    res = 0
+    i = 0
+    while num:
+        digit = num % 10
+        res += LUHN_DOUBLED[digit] if (i & 1) == 0 else digit
+        num //= 10
+        i += 1
+    check_sum = (10 - res % 10) % 10
     return check_sum
 
 
@@ -31,12 +41,33 @@ def gen_card_no():
     Function to generate a random valid card number
         :return cardno (int): A valid card number
     """
-    payload = int(''.join(["{}".format(random.randint(0, 9)) for num in range(0, 15)]))
+    # build the random 15-digit payload and append the check digit with integer arithmetic only
+    payload = 0
+    for num in range(0, 15):
+        payload = payload * 10 + random.randint(0, 9)
     check_dig = luhn_check_dig(payload)
-    cardno = int(str(payload) + str(check_dig))
+    cardno = payload * 10 + check_dig
     return cardno
 
 
+def gen_card_nos(num_cards):
+    """
+    Function to generate a batch of random valid card numbers at once
+        :param num_cards (int): The number of card numbers to generate
+        :return cardnos (list): A list of valid card numbers (int)
+    """
+    # draw the 15 payload digits of every card in a single call, most significant digit first
+    digits = rng.integers(0, 10, size=(num_cards, 15), dtype=np.int8)
+
+    # the rightmost payload digit and every second one before it are doubled
+    res = np.take(LUHN_DOUBLED, digits[:, 14::-2]).sum(axis=1) + digits[:, 13::-2].sum(axis=1)
+    check_sums = (10 - res % 10) % 10
+
+    payloads = digits.astype(np.int64) @ 10 ** np.arange(14, -1, -1, dtype=np.int64)
+    cardnos = (payloads * 10 + check_sums).tolist()
+    return cardnos
+
+
 def random_date(start, end):
     """
     Function to generate a random date between two given values
@@ -56,84 +87,162 @@ def random_date(start, end):
     return start + datetime.timedelta(seconds=random_second)
 
 
-def generate_trans(card_number, timestamp):
+def random_dates(start, end, int_delta):
+    """
+    Function to generate random dates in chronological order between two given values
+        :param start (datetime object): start of the given range
+        :param end (datetime object): end of the given range
+        :param int_delta (int): The largest gap (in seconds) between consecutive dates
+        :return start + offsets (numpy array): Random times (datetime64[s]), the last one on or after end
+    """
+    # range of time in days and seconds
+    delta = end - start
+
+    # range in seconds
+    span = (delta.days * 24 * 60 * 60) + delta.seconds
+
+    # draw the random gaps between consecutive dates in batches until they cover the range
+    offsets = np.zeros(1, dtype=np.int64)
+    while offsets[-1] < span:
+        gaps = rng.integers(0, int_delta, size=2 * span // int_delta + 1)
+        offsets = np.concatenate((offsets, offsets[-1] + gaps.cumsum()))
+
+    # keep every date up to and including the first one on or after the end of the range
+    offsets = offsets[1:np.searchsorted(offsets, span) + 1]
+    return np.datetime64(start, 's') + offsets.astype('timedelta64[s]')
+
+
+def generate_trans(hashed_card, timestamps):
     """
-    Function to generate a semi-realistic distribution of transactions
-        :param card_number (int): A valid card number in plain text format
-        :param timestamp (datetime object): Time the transaction occurred
-        :return hashed_card.hexdigest() (str): hexadecimal encoding of the md5 hashed card number
-        :return timestamp (datetime object): Time the transaction occurred
-        :return amt (float): Amount spent
+    Function to generate a semi-realistic distribution of transactions for a single card
+        :param hashed_card (str): hexadecimal encoding of the md5 hashed card number
+        :param timestamps (numpy array): Times the transactions occurred (datetime64[s])
+        :return hashed_card (str): hexadecimal encoding of the md5 hashed card number
+        :return timestamps (numpy array): Times the transactions occurred (datetime64[s])
+        :return amts (numpy array): Amounts spent (float64)
     """
-    # generate a transaction amount
+    # generate the transaction amounts for every timestamp in a single draw
     # lets assume small transactions are more common than large ones
     # and that this distribution is approximately gaussian
-    # mean and standard deviation to generate the distribution of transaction amounts
-    mu, sigma = 0, 100.0
-    amt = np.abs(np.random.normal(mu, sigma, 1))[0]
-
-    # Let's use md5 to handle the string hashing
-    hashed_card = hashlib.md5(str(card_number).encode())
+    # standard deviation of the (zero mean) distribution of transaction amounts,
+    # the absolute value of a standard normal draw is scaled by it in place
+    sigma = 100.0
+    amts = np.abs(rng.standard_normal(len(timestamps)))
+    amts *= sigma
 
-    return hashed_card.hexdigest(), timestamp, amt
+    return hashed_card, timestamps, amts
 
 
-def flag_fraudulent_activity(transactions, range, threshold, granularity):
+def _flag_windows(card_times, card_psums, starts, ends, threshold, debug=False):
+    """
+    Kernel checking the total spend of every card in every time window against the threshold
+        :param card_times (list): Each card's transaction times in seconds since the epoch, sorted
+        :param card_psums (list): Prefix sums of each card's spend, in the same order as card_times
+        :param starts (numpy array): Start of each window in seconds since the epoch (int64)
+        :param ends (numpy array): End of each window in seconds since the epoch (int64)
+        :param threshold (int): The daily spending threshold above which activity is flagged as fraudulent
+        :param debug (bool): Keep the windows over the threshold and their totals for every flagged card
+        :return flagged_mask (numpy array): Whether each card crossed the threshold in any window
+        :return flagged_windows (list): (card index, window indices, totals) of every flagged card, if debug
+    """
+    flagged_mask = np.zeros(len(card_times), dtype=bool)
+    flagged_windows = []
+    # locate each card's first and last transaction inside every window by binary search,
+    # the spend in between is the difference of two prefix sums
+    for i, (stamps, psum) in enumerate(zip(card_times, card_psums)):
+        lo = np.searchsorted(stamps, starts)
+        hi = np.searchsorted(stamps, ends, side='right')
+        totals = psum[hi] - psum[lo]
+        # reduce each card's windows straight away so memory stays proportional to a single card
+        over = totals > threshold
+        flagged_mask[i] = over.any()
+        if debug and flagged_mask[i]:
+            windows = np.flatnonzero(over)
+            flagged_windows.append((i, windows, totals[windows]))
+    return flagged_mask, flagged_windows
+
+
+def flag_fraudulent_activity(transactions, range, threshold, granularity, debug=False):
     """
     Function to flag potentially fraudulent transaction activity
-        :param transactions (list): A list of transaction data in comma separated string format
-            - '<card hash>,<timestamp>,<amount>'
+        :param transactions (tuple): The unique card hashes plus three columns of transaction data of equal length
+            - (<unique card hashes>, <card indices (int)>, <timestamps (datetime64[s])>, <amounts (float64)>)
+            - the card index of a transaction is the position of its card hash in the unique card hashes,
+              so every card index must lie in range(len(unique_hashes))
         :param range (tuple): The space in time over which transaction take place
         :param threshold (int): The daily spending threshold above which activity is flagged as fraudulent
         :param granularity (int): The increment (in second) by which each timeseries window is shifted
+        :param debug (bool): Print the details of every flagged window
         :return flagged_cards (list): A list of the card hashes which have been identified as fraudulent
     """
-    fraudulent_cards = []
-    # set the initial starting point of the sliding window
-    window_centre = range[0]
-
-    # convert trans into an indexible array
-    transactions = [el.split(',') for el in transactions]
-
-    # get unique card hashes
-    unique_hashes = list(set([x[0] for x in transactions]))
+    unique_hashes, card_idx, stamps, amounts = transactions
     print(f"\nunique cards in dataset: {unique_hashes}\n")
 
-    while window_centre < range[1]:
-
-        # create sliding time window values
-        window_centre += datetime.timedelta(seconds=granularity)
-        window_start = window_centre + datetime.timedelta(seconds=-3600 * 12)
-        window_end = window_centre + datetime.timedelta(seconds=3600 * 12)
-
-        # create a zero entry in a list for each card present
-        amt_per_day = [0]*len(unique_hashes)
-
-        # determine if each transaction dict entry falls within this window
-        for i in transactions:
-            # time of current transaction
-            time = datetime.datetime.strptime(i[1], '%Y-%m-%dT%H:%M:%S')
-            # check time is within the target window
-            if window_start <= time <= window_end:
-                # add transaction amount to that cards amount total per window
-                amt_per_day[unique_hashes.index(i[0])] += float(i[2])
-
-        # check is daily total greater than the threshold amount
-        for card_num in unique_hashes:
-            if amt_per_day[unique_hashes.index(card_num)] > threshold:
+    # card indices as ints, timestamps as seconds since the epoch, amounts as floats
+    card_idx = np.asarray(card_idx, dtype=np.int64)
+    times = np.asarray(stamps, dtype='datetime64[s]').view(np.int64)
+    amts = np.asarray(amounts, dtype=np.float64)
+
+    # sort by card then time once, each card's sorted times are then a slice of the sorted times,
+    # its running total of spend starts from zero so no other card's spend enters its window totals
+    order = np.lexsort((times, card_idx))
+    sorted_times = times[order]
+    sorted_amts = amts[order]
+    bounds = np.concatenate(([0], np.bincount(card_idx, minlength=len(unique_hashes)).cumsum()))
+    card_times = [sorted_times[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    card_psums = [np.concatenate(([0.], sorted_amts[lo:hi].cumsum())) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    # create sliding time window values in seconds since the epoch, the window centre
+    # steps forward from the start of the range until it reaches the end of the range
+    start, end = np.array(range, dtype='datetime64[s]').view(np.int64)
+    centres = np.arange(start + granularity, end + granularity, granularity)
+    window_starts = centres - 3600 * 12
+    window_ends = centres + 3600 * 12
+
+    # skip windows without a single transaction in them, no card can spend over the threshold there.
+    # the centres lie on a regular grid, so the first and last window holding each transaction follow
+    # from its time directly, and counting them in a difference array needs no further sort
+    first = np.maximum(-((start + 3600 * 12 - times) // granularity) - 1, 0)
+    last = np.minimum((times + 3600 * 12 - start) // granularity - 1, len(centres) - 1)
+    inside = first <= last
+    coverage = np.bincount(first[inside], minlength=len(centres) + 1) - \
+        np.bincount(last[inside] + 1, minlength=len(centres) + 1)
+    occupied = coverage.cumsum()[:-1] > 0
+    window_centres = centres[occupied].astype('datetime64[s]')
+
+    # check is daily total greater than the threshold amount in any remaining window,
+    # a card is flagged once however many of its windows cross it
+    flagged_mask, flagged_windows = _flag_windows(card_times, card_psums, window_starts[occupied],
+                                                  window_ends[occupied], threshold, debug)
+
+    if debug:
+        # format every window centre for the report in one vectorized call
+        window_centres = np.datetime_as_string(window_centres)
+        for i, windows, amts_per_day in flagged_windows:
+            for window_centre, amt_per_day in zip(window_centres[windows], amts_per_day):
                 print("Potential fraudulent activity flagged.")
-                print(f"Card hash {card_num} \n Suspicious activity in 24 hours around {window_centre}")
-                print(f"total spend on this day by card {card_num}: {amt_per_day[unique_hashes.index(card_num)]} \n")
-                fraudulent_cards.append(card_num)
+                print(f"Card hash {unique_hashes[i]} \n Suspicious activity in 24 hours around {window_centre}")
+                print(f"total spend on this day by card {unique_hashes[i]}: {amt_per_day} \n")
 
-    # drop duplicate card hashes by casting to a set and back to a list
-    unique_hashes = (list(set(fraudulent_cards)))
+    fraudulent_cards = [unique_hashes[i] for i in np.flatnonzero(flagged_mask)]
 
-    return unique_hashes
+    return fraudulent_cards
 
 
 class TestCases(unittest.TestCase):
 
+    @staticmethod
+    def luhn_valid(card_num):
+        """
+        Helper validating a full card number with the Luhn algorithm, independently of luhn_check_dig
+            :param card_num (int): A card number including its check sum digit
+            :return (bool): Whether the card number passes Luhn validation
+        """
+        # double every second digit from the right, skipping the check digit, and add the digits of the product
+        digits = [int(x) for x in str(card_num)[::-1]]
+        res = sum(digits[0::2]) + sum(sum(divmod(2 * x, 10)) for x in digits[1::2])
+        return res % 10 == 0
+
     def test_single_trans(self):
         """
         This test case should return a single flagged card number ('test_card_a') as fraudulent
@@ -148,10 +257,9 @@ class TestCases(unittest.TestCase):
 
         # random date in the range
         stamp = random_date(d1, d2)
-        str_stamp = stamp.strftime('%Y-%m-%dT%H:%M:%S')
 
         # generate a single transaction
-        single_transaction = [f"test_card_a,{str_stamp},10"]
+        single_transaction = (["test_card_a"], [0], [stamp], [10])
 
         # check for any transactions exceeding the threshold (threshold = 0)
         flagged_cards = flag_fraudulent_activity(single_transaction, (d1, d2), 0, 3600 * 24)
@@ -172,13 +280,11 @@ class TestCases(unittest.TestCase):
         d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
         # random date in the range
-        stamp = random_date(d1, d2)
-        str_stamp_a = stamp.strftime('%Y-%m-%dT%H:%M:%S')
-        stamp = random_date(d1, d2)
-        str_stamp_b = stamp.strftime('%Y-%m-%dT%H:%M:%S')
+        stamp_a = random_date(d1, d2)
+        stamp_b = random_date(d1, d2)
 
         # generate a pair of transactions, one legitimate, one fraudulent
-        two_transactions = [f"test_card_a,{str_stamp_a},10", f"test_card_b,{str_stamp_b},1000"]
+        two_transactions = (["test_card_a", "test_card_b"], [0, 1], [stamp_a, stamp_b], [10, 1000])
         # check for any transactions exceeding the threshold (threshold = 0)
         flagged_cards = flag_fraudulent_activity(two_transactions, (d1, d2), 500, 3600 * 24)
         print(f"Two transaction (1 fraudulent) test, flagged card number: \n{flagged_cards}")
@@ -198,13 +304,11 @@ class TestCases(unittest.TestCase):
         d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
         # random date in the range
-        stamp = random_date(d1, d2)
-        str_stamp_a = stamp.strftime('%Y-%m-%dT%H:%M:%S')
-        stamp = random_date(d1, d2)
-        str_stamp_b = stamp.strftime('%Y-%m-%dT%H:%M:%S')
+        stamp_a = random_date(d1, d2)
+        stamp_b = random_date(d1, d2)
 
         # generate a pair of transactions, one legitimate, one fraudulent
-        two_transactions = [f"test_card_a,{str_stamp_a},10", f"test_card_b,{str_stamp_b},400"]
+        two_transactions = (["test_card_a", "test_card_b"], [0, 1], [stamp_a, stamp_b], [10, 400])
         # check for any transactions exceeding the threshold (threshold = 0)
         flagged_cards = flag_fraudulent_activity(two_transactions, (d1, d2), 500, 3600 * 24)
         print(f"Two legitimate transactions test, flagged card number: \n{flagged_cards}")
@@ -225,19 +329,48 @@ class TestCases(unittest.TestCase):
         d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
         # random date in the range
-        stamp = random_date(d1, d2)
-        str_stamp_a = stamp.strftime('%Y-%m-%dT%H:%M:%S')
-        stamp += datetime.timedelta(seconds=10)
-        str_stamp_b = stamp.strftime('%Y-%m-%dT%H:%M:%S')
+        stamp_a = random_date(d1, d2)
+        stamp_b = stamp_a + datetime.timedelta(seconds=10)
 
         # generate a pair of transactions, one legitimate, one fraudulent
-        two_transactions = [f"test_card_a,{str_stamp_a},10", f"test_card_a,{str_stamp_b},495"]
+        two_transactions = (["test_card_a"], [0, 0], [stamp_a, stamp_b], [10, 495])
         # check for any transactions exceeding the threshold (threshold = 0)
         flagged_cards = flag_fraudulent_activity(two_transactions, (d1, d2), 500, 3600 * 24)
         print(f"Two transactions summing to beyond threshold test, flagged card number: \n{flagged_cards}")
 
         self.assertEqual(flagged_cards, ['test_card_a'], "Should flag 'test_card_a'")
 
+    def test_luhn_check_dig(self):
+        """
+        This test case should return a check sum digit from 0 to 9 which makes each card number pass Luhn validation
+            :param payloads (range): Payloads covering every Luhn sum, including those already a multiple of 10
+            :return (str): Pass or fail indicator
+        """
+        # well known example card number 79927398713
+        self.assertEqual(luhn_check_dig(7992739871), 3, "Should give check sum digit 3")
+
+        payloads = range(0, 1000)
+        for payload in payloads:
+            check_dig = luhn_check_dig(payload)
+            self.assertIn(check_dig, range(10), f"Should give a single check sum digit for {payload}")
+            self.assertTrue(self.luhn_valid(payload * 10 + check_dig), f"Should validate {payload}{check_dig}")
+
+    def test_gen_card_nos(self):
+        """
+        This test case should return valid card numbers of at most 16 digits, generated one at a time or in bulk
+            :param num_cards (int): The number of card numbers to generate
+            :return (str): Pass or fail indicator
+        """
+        num_cards = 1000
+        card_nos = [gen_card_no() for card in range(num_cards)] + gen_card_nos(num_cards)
+        self.assertEqual(len(card_nos), 2 * num_cards, f"Should generate {num_cards} card numbers each way")
+
+        for card_no in card_nos:
+            self.assertLess(card_no, 10 ** 16, f"Should have at most 16 digits: {card_no}")
+            self.assertTrue(self.luhn_valid(card_no), f"Should validate {card_no}")
+            # the bulk and single card paths share the scalar check sum digit
+            self.assertEqual(card_no % 10, luhn_check_dig(card_no // 10), f"Should agree on {card_no}")
+
 
 if __name__ == '__main__':
 
@@ -247,28 +380,32 @@ if __name__ == '__main__':
     d1 = datetime.datetime.strptime('1/1/2021 12:00 AM', '%m/%d/%Y %I:%M %p')
     d2 = datetime.datetime.strptime('1/1/2022 12:00 AM', '%m/%d/%Y %I:%M %p')
 
-    # create a list to store our sample data in
-    trans = []
+    # create lists to store each card's hash and columns of sample data in
+    card_hashes = []
+    card_idx = []
+    stamps = []
+    amts = []
 
     num_cards = int(input("How many cards are we generating? \n"))
-    for card in range(num_cards):
-        # create the card no. using a Luhn algorithm check sum digit appended to a random 15-digit number
-        card_num = gen_card_no()
-
-        # generate transaction data in chronological order
-        stamp = d1
-        while stamp < d2:
-            stamp = random_date(stamp, stamp + datetime.timedelta(seconds=3600 * 24))
-            str_stamp = stamp.strftime('%Y-%m-%dT%H:%M:%S')
-            # return a transaction
-            hashed_card_no, str_stamp, amt = generate_trans(card_num, str_stamp)
-            trans.append(f"{hashed_card_no},{str_stamp},{amt}")
-
-    print(f"\n{len(trans)} transactions generated")
-
-    # get unique card hashes from list trans
-    elmnts = list(set([x[0] for x in [el.split(',') for el in trans]]))
-    print(f"generated sample data for card hashes: ({elmnts})")
+    # create the card nos. using a Luhn algorithm check sum digit appended to a random 15-digit number
+    for k, card_num in enumerate(gen_card_nos(num_cards)):
+        # Let's use md5 to handle the string hashing, once per card
+        hashed_card = hashlib.md5(str(card_num).encode()).hexdigest()
+        card_hashes.append(hashed_card)
+
+        # generate transaction data in chronological order, consecutive transactions at most a day apart
+        _, card_stamps, card_amts = generate_trans(hashed_card, random_dates(d1, d2, 3600 * 24))
+        card_idx.append(np.full(len(card_stamps), k))
+        stamps.append(card_stamps)
+        amts.append(card_amts)
+
+    # join every card's transactions into three columns: card indices, timestamps and amounts,
+    # card k is the card hash card_hashes[k]
+    trans = (card_hashes, np.concatenate(card_idx), np.concatenate(stamps), np.concatenate(amts))
+    print(f"\n{len(trans[1])} transactions generated")
+
+    # unique card hashes, one per generated card
+    print(f"generated sample data for card hashes: ({card_hashes})")
 
     threshold = int(input("Enter a price threshold: \n"))
 